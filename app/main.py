@@ -8,12 +8,18 @@ import hashlib
 import json
 import os
 from datetime import datetime, timezone
+from functools import lru_cache
 from uuid import uuid4
 
-from fastapi import FastAPI, Request, Response, Path
+from fastapi import FastAPI, Request, Response, Path, Query
 from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from markupsafe import Markup
+from starlette.convertors import Convertor, register_url_convertor
+
+import origin_hits
+from countries import COUNTRY_NAMES, flag_emoji
 
 app = FastAPI(title="ProbeOps Lab", docs_url=None, redoc_url=None)
 
@@ -197,6 +203,8 @@ Disallow: /final
 Disallow: /delay/
 Disallow: /status/
 Disallow: /size/
+Disallow: /cache/counted/
+Disallow: /cache/origin-hits
 Disallow: /us
 Disallow: /ca
 Disallow: /fi
@@ -241,7 +249,7 @@ async def llms_txt():
 > Free, open-source testing lab for HTTP redirects, caching, geo-routing, and request debugging behind Cloudflare and other CDNs.
 
 ## Overview
-ProbeOps Lab (probeopslab.com) is a public reference site built for DevOps engineers, SREs, and CDN specialists. It provides live, interactive endpoints for testing and understanding HTTP behavior at the edge. No authentication, no cookies, no tracking. Fully stateless.
+ProbeOps Lab (probeopslab.com) is a public reference site built for DevOps engineers, SREs, and CDN specialists. It provides live, interactive endpoints for testing and understanding HTTP behavior at the edge. No authentication, no cookies, no tracking. The only server-side state is the in-memory origin-hit counters behind /cache/counted.
 
 Maintained by ProbeOps (probeops.com), a network monitoring and diagnostic platform.
 
@@ -263,11 +271,15 @@ Maintained by ProbeOps (probeops.com), a network monitoring and diagnostic platf
 - Test 8 caching directives: public-short, public-long, no-store, no-cache, private, s-maxage, stale-while-revalidate, immutable
 - Each returns JSON with appropriate Cache-Control headers
 - Endpoints: /cache/public-short, /cache/no-store, /cache/s-maxage, etc.
+- Origin-hit counter: /cache/counted/{name}?config=s-maxage&delay=500 counts requests that reach the origin per cache key (path plus config and delay, so every combination is counted separately; other query parameters are rejected)
+- Hit query: /cache/origin-hits?window=60 returns origin hits per cache key, all-time and per time window, summed across live workers; counts reset when a worker restarts, and the least recently hit keys are dropped when the table is full
 
 ### Geo Redirect Lab
 - URL: https://probeopslab.com/geo-redirect
 - Demonstrates Cloudflare geo-based routing
 - Visitors from US, Canada, Finland get country-specific landing pages
+- Every ISO 3166-1 country has a landing page: /us, /de, /jp, ... plus /row for Rest of World
+- Add ?edge=1 for an edge-cacheable variant (same page for every visitor, no country or per-request details)
 - Uses Cloudflare edge rules for redirect logic
 
 ### HTTP Utility Tools
@@ -293,7 +305,7 @@ Maintained by ProbeOps (probeops.com), a network monitoring and diagnostic platf
 - URL: https://probeopslab.com/about
 - Open-source: https://github.com/kumarprobeops/probeopslab
 - Built with: FastAPI, NGINX, Docker, Cloudflare
-- No authentication required, fully stateless
+- No authentication required, no cookies, no database (origin-hit counters are kept in shared memory only)
 - Hosted on Hetzner Cloud (Helsinki)
 
 ## Related
@@ -403,6 +415,76 @@ async def cache_immutable():
     return create_cache_response("/cache/immutable", c["cache_control"], c["description"])
 
 
+# Query parameters accepted by /cache/counted (each one is part of the cache key)
+COUNTED_PARAMS = ("config", "delay")
+
+
+def cache_counted_error(error: str, status_code: int, **details) -> Response:
+    """JSON error response for the origin-hit counter endpoints."""
+    body = {"error": error, **details}
+    return Response(
+        content=json.dumps(body, indent=2),
+        media_type="application/json",
+        status_code=status_code
+    )
+
+
+@app.api_route("/cache/counted/{key}", methods=["GET", "HEAD"])
+async def cache_counted(
+    request: Request,
+    key: str = Path(..., pattern=r"^[A-Za-z0-9_-]{1,32}$"),
+    config: str = Query("s-maxage"),
+    delay: int = Query(0, ge=0, le=10000),
+):
+    """
+    Cacheable endpoint that counts every request reaching the origin, per cache key.
+    The cache key is the path plus the normalized query, so each config/delay
+    combination is counted separately, as a CDN would cache it. Other query
+    parameters are rejected, so callers cannot mint unlimited cache keys.
+    An optional delay (ms) holds the response to open a window for CDN request collapsing.
+    """
+    param_names = [k for k, _ in request.query_params.multi_items()]
+    unknown = sorted(set(param_names) - set(COUNTED_PARAMS))
+    if unknown or len(param_names) != len(set(param_names)):
+        return cache_counted_error(
+            "Unknown or repeated query parameters", 400, requested_params=param_names, allowed_params=list(COUNTED_PARAMS)
+        )
+    if config not in CACHE_CONFIGS:
+        return cache_counted_error("Invalid cache config", 400, requested_config=config, allowed_configs=list(CACHE_CONFIGS))
+
+    cache_key = origin_hits.cache_key(f"/cache/counted/{key}", [("config", config), ("delay", str(delay))])
+    worker_hits = origin_hits.worker_counters().hit(cache_key)
+    if delay:
+        await asyncio.sleep(delay / 1000)
+
+    c = CACHE_CONFIGS[config]
+    response = create_cache_response(cache_key, c["cache_control"], c["description"])
+    response.headers["X-Origin-Cache-Key"] = cache_key
+    response.headers["X-Origin-Worker"] = str(os.getpid())
+    response.headers["X-Origin-Worker-Hits"] = str(worker_hits)
+    return response
+
+
+@app.get("/cache/origin-hits")
+def cache_origin_hits(
+    window: int = Query(60, ge=1, le=origin_hits.WINDOW),
+    key: str | None = Query(None, max_length=origin_hits.NAME_BYTES),
+):
+    """
+    Origin hits per /cache/counted cache key, summed across live workers: all-time and within the last `window` seconds.
+    Pass a cache key (as returned in X-Origin-Cache-Key) as `key` for its per-second timeline.
+    Plain def: summing the worker tables runs in the threadpool, off the event loop serving /cache/counted.
+    """
+    body = origin_hits.snapshot(window, key)
+    body["generated_at"] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    response = Response(
+        content=json.dumps(body, indent=2),
+        media_type="application/json"
+    )
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
 # =============================================================================
 # Redirect Labs
 # =============================================================================
@@ -466,68 +548,97 @@ async def geo_redirect(request: Request):
     )
 
 
-@app.get("/us", response_class=HTMLResponse)
-async def region_us(request: Request):
-    """US region landing page."""
-    ctx = get_request_context(request)
-    return templates.TemplateResponse(
-        "region.html",
-        {
-            "request": request,
-            "ctx": ctx,
-            "region_code": "US",
-            "region_name": "United States",
-            "region_emoji": "🇺🇸",
-        },
-    )
+# Region landing pages: every ISO 3166-1 country plus Rest of World, keyed by URL slug
+REGIONS = {
+    code.lower(): {"code": code, "name": name, "emoji": flag_emoji(code)}
+    for code, name in COUNTRY_NAMES.items()
+}
+REGIONS["row"] = {"code": "ROW", "name": "Rest of World", "emoji": "🌍"}
 
+# Countries with their own redirect rule on /geo-redirect; everyone else lands on /row
+GEO_REDIRECT_COUNTRIES = {"US", "CA", "FI"}
 
-@app.get("/ca", response_class=HTMLResponse)
-async def region_ca(request: Request):
-    """Canada region landing page."""
-    ctx = get_request_context(request)
-    return templates.TemplateResponse(
-        "region.html",
-        {
-            "request": request,
-            "ctx": ctx,
-            "region_code": "CA",
-            "region_name": "Canada",
-            "region_emoji": "🇨🇦",
-        },
-    )
+# Edge-cacheable region pages depend only on the URL, so shared caches may keep them
+REGION_EDGE_CACHE_CONTROL = "public, max-age=60, s-maxage=300"
 
+# Placeholder for the per-request fragment inside a pre-rendered region page
+REGION_CTX_MARKER = "<!--region-ctx-->"
 
-@app.get("/fi", response_class=HTMLResponse)
-async def region_fi(request: Request):
-    """Finland region landing page."""
-    ctx = get_request_context(request)
-    return templates.TemplateResponse(
-        "region.html",
-        {
-            "request": request,
-            "ctx": ctx,
-            "region_code": "FI",
-            "region_name": "Finland",
-            "region_emoji": "🇫🇮",
-        },
+
+@lru_cache(maxsize=None)
+def render_region_shell(slug: str) -> tuple[str, str]:
+    """
+    Render a region page once and split it around the per-request fragment.
+    No request is involved: base.html takes the page path from canonical_path.
+    """
+    region = REGIONS[slug]
+    html = templates.get_template("region.html").render(
+        canonical_path=f"/{slug}",
+        region_code=region["code"],
+        region_name=region["name"],
+        region_emoji=region["emoji"],
+        ctx_fragment=Markup(REGION_CTX_MARKER),
+    )
+    head, tail = html.split(REGION_CTX_MARKER, 1)
+    return head, tail
+
+
+def render_region_ctx(slug: str, ctx: dict | None) -> str:
+    """Render the request-dependent part of a region page (ctx=None for the edge-cacheable variant)."""
+    region = REGIONS[slug]
+    code = region["code"]
+    return templates.get_template("region_ctx.html").render(
+        ctx=ctx,
+        canonical_path=f"/{slug}",
+        region_code=code,
+        region_name=region["name"],
+        region_match=ctx is not None
+        and (ctx["country"] == code or (code == "ROW" and ctx["country"] not in GEO_REDIRECT_COUNTRIES)),
+        edge_cache=ctx is None,
+        edge_cache_control=REGION_EDGE_CACHE_CONTROL,
     )
 
 
-@app.get("/row", response_class=HTMLResponse)
-async def region_row(request: Request):
-    """Rest of World region landing page."""
+@lru_cache(maxsize=None)
+def render_region_edge_page(slug: str) -> str:
+    """
+    Full region page for edge-cacheable mode, which depends only on the slug.
+    Cloudflare ignores Vary (except Accept-Encoding), so nothing visitor-specific may go in.
+    """
+    head, tail = render_region_shell(slug)
+    return head + render_region_ctx(slug, None) + tail
+
+
+class RegionSlugConvertor(Convertor):
+    """Path convertor matching only region slugs, so /{slug:region} leaves every other path alone."""
+
+    regex = "|".join(sorted(REGIONS))
+
+    def convert(self, value: str) -> str:
+        return value
+
+    def to_string(self, value: str) -> str:
+        return value
+
+
+register_url_convertor("region", RegionSlugConvertor())
+
+
+@app.get("/{slug:region}", response_class=HTMLResponse)
+async def region_page(request: Request, slug: str, edge: bool = False):
+    """
+    Region landing page for any ISO country code (/us, /de, /jp, ...) or /row.
+    The page shell is rendered once per region; only the ctx fragment is rendered per request.
+    With ?edge=1 the response leaves out everything visitor-specific and is cacheable at the edge.
+    """
+    if edge:
+        response = HTMLResponse(render_region_edge_page(slug))
+        response.headers["Cache-Control"] = REGION_EDGE_CACHE_CONTROL
+        return response
+
     ctx = get_request_context(request)
-    return templates.TemplateResponse(
-        "region.html",
-        {
-            "request": request,
-            "ctx": ctx,
-            "region_code": "ROW",
-            "region_name": "Rest of World",
-            "region_emoji": "🌍",
-        },
-    )
+    head, tail = render_region_shell(slug)
+    return HTMLResponse(head + render_region_ctx(slug, ctx) + tail)
 
 
 # =============================================================================
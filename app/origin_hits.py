@@ -0,0 +1,210 @@
+"""
+Origin-hit counters shared across gunicorn workers.
+
+Each worker process owns one fixed-size file in shared memory (/dev/shm) and is
+its only writer, so increments need no locks: the event loop runs them without
+yielding, and readers sum every worker's file. Table layout:
+
+    last_hit[KEYS]  | totals[KEYS] | stamps[WINDOW] | buckets[WINDOW * KEYS]   (uint64)
+    names[KEYS * NAME_BYTES]                                                   (utf-8, NUL padded)
+
+Counters are keyed on the full cache key (path plus normalized query), hashed
+into the table with linear probing. Each worker claims slots independently, so
+readers merge slots by name. buckets is a ring of one-second rows; stamps
+holds the unix second each row currently counts, so stale rows are detected
+(and reset) without a sweeper. last_hit holds the worker's hit sequence number
+at each slot's latest hit (0 = free); when the table is full, the least
+recently hit slot is recycled for the new key.
+
+A table starts at zero when its worker starts. Tables of workers that have
+exited are deleted by the next reader, so their hits drop out of the totals.
+"""
+
+import mmap
+import os
+import tempfile
+import time
+import zlib
+from urllib.parse import urlencode
+
+KEYS = 1024
+WINDOW = 300
+NAME_BYTES = 96  # longest key: /cache/counted/<32 chars>?config=stale-while-revalidate&delay=10000
+COUNTER_SLOTS = 2 * KEYS + WINDOW + WINDOW * KEYS
+SLOT_BYTES = 8
+TABLE_BYTES = COUNTER_SLOTS * SLOT_BYTES + KEYS * NAME_BYTES
+
+_default_root = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+HITS_DIR = os.environ.get("ORIGIN_HITS_DIR", os.path.join(_default_root, "probeopslab-origin-hits"))
+
+_ZERO_ROW = memoryview(bytes(KEYS * SLOT_BYTES)).cast("Q")
+_ZERO_NAME = bytes(NAME_BYTES)
+
+
+def cache_key(path: str, params: list[tuple[str, str]]) -> str:
+    """Normalized cache key: path plus the query parameters in sorted order."""
+    return f"{path}?{urlencode(sorted(params))}"
+
+
+class WorkerCounters:
+    """Counter table for the current worker process (single writer)."""
+
+    def __init__(self):
+        os.makedirs(HITS_DIR, exist_ok=True)
+        self.pid = os.getpid()
+        path = os.path.join(HITS_DIR, f"{self.pid}.bin")
+        # O_TRUNC: a reused PID must not inherit an earlier worker's counts
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, TABLE_BYTES)
+            self._mmap = mmap.mmap(fd, TABLE_BYTES)
+        finally:
+            os.close(fd)
+        slots = memoryview(self._mmap)[:COUNTER_SLOTS * SLOT_BYTES].cast("Q")
+        self.last_hit = slots[:KEYS]
+        self.totals = slots[KEYS:2 * KEYS]
+        self.stamps = slots[2 * KEYS:2 * KEYS + WINDOW]
+        self.buckets = slots[2 * KEYS + WINDOW:]
+        self.names = memoryview(self._mmap)[COUNTER_SLOTS * SLOT_BYTES:]
+        self._slots = {}
+        self._slot_keys = [None] * KEYS
+        self._seq = 0
+
+    def _claim(self, key: str) -> int:
+        """Find a slot for a new cache key: first free slot, else the least recently hit one."""
+        start = zlib.crc32(key.encode()) % KEYS
+        oldest = None
+        for i in range(KEYS):
+            slot = (start + i) % KEYS
+            if self.last_hit[slot] == 0:
+                break
+            if oldest is None or self.last_hit[slot] < self.last_hit[oldest]:
+                oldest = slot
+        else:
+            slot = oldest
+            del self._slots[self._slot_keys[slot]]
+            self.totals[slot] = 0
+            for row in range(WINDOW):
+                self.buckets[row * KEYS + slot] = 0
+
+        name = key.encode()
+        self.names[slot * NAME_BYTES:(slot + 1) * NAME_BYTES] = name + _ZERO_NAME[len(name):]
+        self._slots[key] = slot
+        self._slot_keys[slot] = key
+        return slot
+
+    def hit(self, key: str) -> int:
+        """Count one origin hit for a cache key; returns this worker's total for it."""
+        now = int(time.time())
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._claim(key)
+        row = now % WINDOW
+        base = row * KEYS
+        if self.stamps[row] != now:
+            self.buckets[base:base + KEYS] = _ZERO_ROW
+            self.stamps[row] = now
+        self.buckets[base + slot] += 1
+        self.totals[slot] += 1
+        self._seq += 1
+        self.last_hit[slot] = self._seq
+        return self.totals[slot]
+
+
+_worker = None
+
+
+def worker_counters() -> WorkerCounters:
+    """Counter table for this process, created on first use (after the worker fork)."""
+    global _worker
+    if _worker is None or _worker.pid != os.getpid():
+        _worker = WorkerCounters()
+    return _worker
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _table_paths():
+    """Yield (pid, path) for every live worker table; delete tables of exited workers."""
+    try:
+        names = os.listdir(HITS_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext != ".bin" or not stem.isdigit():
+            continue
+        path = os.path.join(HITS_DIR, name)
+        if not _pid_alive(int(stem)):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            continue
+        yield stem, path
+
+
+def _sum_table(slots, names, seconds, keys: dict, timeline: dict, key: str | None) -> int:
+    """Add one worker table into keys/timeline; returns the worker's total hits."""
+    # Only rows inside the window whose stamp is current hold counts worth reading
+    rows = [
+        (t, 2 * KEYS + WINDOW + (t % WINDOW) * KEYS)
+        for t in seconds
+        if slots[2 * KEYS + t % WINDOW] == t
+    ]
+    worker_total = 0
+    for slot in range(KEYS):
+        if slots[slot] == 0:
+            continue
+        name = bytes(names[slot * NAME_BYTES:(slot + 1) * NAME_BYTES]).rstrip(b"\0").decode(errors="replace")
+        entry = keys.setdefault(name, {"total": 0, "window": 0})
+        entry["total"] += slots[KEYS + slot]
+        worker_total += slots[KEYS + slot]
+        for t, base in rows:
+            hits = slots[base + slot]
+            entry["window"] += hits
+            if name == key:
+                timeline[t] += hits
+    return worker_total
+
+
+def snapshot(window: int, key: str | None = None) -> dict:
+    """
+    Sum origin hits across all live workers, merged by cache key.
+    Returns totals and last-`window`-seconds counts per cache key; with `key`, also a per-second timeline.
+    Tables are mapped read-only, so only the pages actually summed are read.
+    """
+    now = int(time.time())
+    seconds = range(now - window + 1, now + 1)
+    keys = {}
+    timeline = {t: 0 for t in seconds}
+    workers = {}
+
+    for pid, path in _table_paths():
+        try:
+            with open(path, "rb") as f:
+                table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            continue
+        with table:
+            if len(table) != TABLE_BYTES:
+                continue
+            with memoryview(table) as view, \
+                    view[:COUNTER_SLOTS * SLOT_BYTES] as counters, \
+                    counters.cast("Q") as slots, \
+                    view[COUNTER_SLOTS * SLOT_BYTES:] as names:
+                workers[pid] = _sum_table(slots, names, seconds, keys, timeline, key)
+
+    result = {"window_seconds": window, "workers": workers, "keys": keys}
+    if key is not None:
+        result["key"] = key
+        result["timeline"] = [{"second": t, "hits": n} for t, n in timeline.items()]
+    return result